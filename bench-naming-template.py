@@ -0,0 +1,226 @@
+# Micro-benchmark comparing the compiled naming templates of
+# naming_template.py with the previous ad-hoc implementations of
+# convert-music.py, rearrange-music.py and create-toc.py.
+#
+# The previous implementations are copied here verbatim (apart from the
+# sanitizer and collecting the results) because the scripts cannot be
+# imported. Before timing anything, both sides must produce the same
+# results and a few edge cases are checked. Every run compiles a fresh
+# template so the sanitizer cache starts out empty.
+#
+# Usage example:
+#   python3 bench-naming-template.py -n 100000
+#
+# See `python3 bench-naming-template.py --help` for details.
+
+import os
+import string
+import timeit
+import argparse
+import unicodedata
+from naming_template import NamingTemplate
+
+VALID_FNAME_CHARS = "-_() %s%s" % (string.ascii_letters, string.digits)
+
+TRACKS_PER_ALBUM = 12
+
+CONVERT_LEGACY_FORMAT = "genre" + os.sep + "artist" + os.sep + "year - album" + os.sep + "track - title"
+CONVERT_FORMAT = "{genre}" + os.sep + "{artist}" + os.sep + "{year} - {album}" + os.sep + "{track} - {title}"
+REARRANGE_FORMAT = "{genre}" + os.sep + "{artist}" + os.sep + "{date} - {album}" + os.sep + "{tracknumber} - {title}"
+TOC_FORMAT = ["artist", "album", "year", "genre", "track", "title"]
+TOC_DELIM = "#"
+
+def clean_filename(filename, whitelist=VALID_FNAME_CHARS):
+    cleaned_filename = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode()
+    return ''.join(c for c in cleaned_filename if c in whitelist)
+
+def make_albums(count):
+    # Tracks of the same album share artist, album, genre and year, which is
+    # what the sanitizer memoization relies on.
+    albums = []
+    for index in range(count // TRACKS_PER_ALBUM + 1):
+        album = {
+            "artist": f"Wolfheart {index % 50}",
+            "album": f"Winterborn: Édition {index}",
+            "genre": "Melodic Death Metal",
+            "year": str(2000 + index % 20),
+            "tracks": [{"track": "%02d" % (track + 1), "title": f"The hunt, part {index}.{track}!"}
+                       for track in range(TRACKS_PER_ALBUM)]
+        }
+        albums.append(album)
+    return albums
+
+def iterate_tracks(albums, count):
+    done = 0
+    for album in albums:
+        for track in album["tracks"]:
+            if done == count:
+                return
+            done += 1
+            yield album, track
+
+# convert-music.py
+
+def legacy_convert(albums, count):
+    paths = []
+    for toc, track in iterate_tracks(albums, count):
+        paths.append(CONVERT_LEGACY_FORMAT \
+            .replace("artist", clean_filename(toc["artist"])) \
+            .replace("album", clean_filename(toc["album"])) \
+            .replace("genre", clean_filename(toc["genre"])) \
+            .replace("year", clean_filename(toc["year"])) \
+            .replace("track", clean_filename(track["track"])) \
+            .replace("title", clean_filename(track["title"])))
+    return paths
+
+def template_convert(albums, count):
+    template = NamingTemplate(CONVERT_FORMAT, default_sanitizer=clean_filename)
+    paths = []
+    for toc, track in iterate_tracks(albums, count):
+        paths.append(template.render({
+            "artist": toc["artist"],
+            "album": toc["album"],
+            "genre": toc["genre"],
+            "year": toc["year"],
+            "track": track["track"],
+            "title": track["title"]
+        }))
+    return paths
+
+# rearrange-music.py
+
+def make_rearrange_tags(toc, track):
+    return {
+        "genre": toc["genre"],
+        "artist": toc["artist"],
+        "date": toc["year"],
+        "album": toc["album"],
+        "tracknumber": track["track"],
+        "title": track["title"]
+    }
+
+def legacy_rearrange(albums, count):
+    paths = []
+    for toc, track in iterate_tracks(albums, count):
+        tags = {"{%s}" % name.upper(): value for name, value in make_rearrange_tags(toc, track).items()}
+        newpath = REARRANGE_FORMAT.upper()
+        for tag in tags:
+            if tag in newpath:
+                newpath = newpath.replace(tag, clean_filename(tags[tag]))
+        paths.append(newpath)
+    return paths
+
+def template_rearrange(albums, count):
+    template = NamingTemplate(REARRANGE_FORMAT, default_sanitizer=clean_filename)
+    return [template.render(make_rearrange_tags(toc, track)) for toc, track in iterate_tracks(albums, count)]
+
+# create-toc.py
+
+def make_toc_filenames(albums, count):
+    return [TOC_DELIM.join([toc["artist"], toc["album"], toc["year"], toc["genre"], track["track"], track["title"]])
+            for toc, track in iterate_tracks(albums, count)]
+
+def legacy_toc(filenames):
+    all_tags = []
+    for filename in filenames:
+        tag_list = filename.split(TOC_DELIM)
+        assert len(tag_list) <= len(TOC_FORMAT)
+
+        file_tags = {}
+        for index, value in enumerate(tag_list):
+            file_tags[TOC_FORMAT[index]] = value
+        all_tags.append(file_tags)
+    return all_tags
+
+def template_toc(filenames):
+    template = NamingTemplate(TOC_DELIM.join("{%s}" % tag for tag in TOC_FORMAT))
+    return [template.parse(filename) for filename in filenames]
+
+# Correctness
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+def check_same_results(name, legacy_results, template_results):
+    check(len(legacy_results) == len(template_results), f"{name}: different number of results")
+    for legacy, template in zip(legacy_results, template_results):
+        check(legacy == template, f"{name}: legacy {legacy!r} != template {template!r}")
+
+def check_edge_cases():
+    # Tag names in values or literal text must not be replaced again.
+    template = NamingTemplate("year {track} - {title}")
+    path = template.render({"track": "01", "title": "title track"})
+    check(path == "year 01 - title track", f"render: unexpected {path!r}")
+
+    template = NamingTemplate("{{{Artist}}}/{album}")
+    path = template.render({"artist": "a"})
+    check(path == "{a}/", f"render: unexpected {path!r}")
+
+    # Placeholder, sanitizer and allowed field names are case-insensitive.
+    template = NamingTemplate("{Title}", sanitizers={"TITLE": str.upper}, allowed_fields=["TITLE"])
+    path = template.render({"title": "x"})
+    check(path == "X", f"render: unexpected {path!r}")
+
+    # Without memoization the sanitizer is called for every value.
+    calls = []
+    template = NamingTemplate("{artist}/{title}", default_sanitizer=lambda value: calls.append(value) or value, memoize=False)
+    template.render({"artist": "a", "title": "t"})
+    template.render({"artist": "a", "title": "t"})
+    check(calls == ["a", "t", "a", "t"], f"render: sanitizer calls {calls!r}")
+
+    template = NamingTemplate("[{artist}] {album} ({year})")
+    for text, expected in [
+            ("[a] b (2000)", {"artist": "a", "album": "b", "year": "2000"}),
+            ("[a] b", {"artist": "a", "album": "b"}),
+            ("[a]", None),
+            ("[a] b (2000", None),
+            ("[a] b (2000) c", None)]:
+        tags = template.parse(text)
+        check(tags == expected, f"parse {text!r}: expected {expected!r}, got {tags!r}")
+
+    for format in ["{artist}{album}", "{bogus}"]:
+        try:
+            NamingTemplate(format, allowed_fields=TOC_FORMAT).parse("a")
+        except ValueError:
+            continue
+        raise AssertionError(f"Invalid template {format!r} was accepted")
+
+def report(name, legacy_seconds, template_seconds, count):
+    print("%-10s legacy %8.3fs (%6.2f us/path)   template %8.3fs (%6.2f us/path)   speedup %5.2fx" % (
+        name,
+        legacy_seconds, legacy_seconds / count * 1e6,
+        template_seconds, template_seconds / count * 1e6,
+        legacy_seconds / template_seconds))
+
+def best_of(repeat, func):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=100000, help="Number of paths per run")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Number of runs, the best one is reported")
+    return parser.parse_args()
+
+args = parse_args()
+
+albums = make_albums(args.count)
+filenames = make_toc_filenames(albums, args.count)
+
+check_edge_cases()
+check_same_results("convert", legacy_convert(albums, args.count), template_convert(albums, args.count))
+check_same_results("rearrange", legacy_rearrange(albums, args.count), template_rearrange(albums, args.count))
+check_same_results("create-toc", legacy_toc(filenames), template_toc(filenames))
+
+report("convert",
+       best_of(args.repeat, lambda: legacy_convert(albums, args.count)),
+       best_of(args.repeat, lambda: template_convert(albums, args.count)),
+       args.count)
+report("rearrange",
+       best_of(args.repeat, lambda: legacy_rearrange(albums, args.count)),
+       best_of(args.repeat, lambda: template_rearrange(albums, args.count)),
+       args.count)
+report("create-toc",
+       best_of(args.repeat, lambda: legacy_toc(filenames)),
+       best_of(args.repeat, lambda: template_toc(filenames)),
+       args.count)
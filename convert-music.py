@@ -1,10 +1,12 @@
 import os
+import re
 import json
 import eyed3
 import codecs
 import argparse
 import subprocess
 from pathvalidate import sanitize_filename
+from naming_template import compile_template
 
 ARTIST_TAG_NAME = 'artist'
 ALBUM_TAG_NAME = 'album'
@@ -32,6 +34,8 @@ CONVERTER_OUTPUT = "%output%"
 
 TOC_FILENAME = "ToC.json"
 
+TEMPLATE_FIELDS = [ARTIST_TAG_NAME, ALBUM_TAG_NAME, GENRE_TAG_NAME, YEAR_TAG_NAME, TRACK_TAG_NAME, TITLE_TAG_NAME]
+
 def is_hidden(name):
     return name[0] == "."
 
@@ -50,15 +54,40 @@ def sanitize(value):
 
     return sanitize_filename(value)
 
-def make_destination_file_name(output_config, toc, track):
+def make_legacy_format_suggestion(format):
+    # Older configurations used bare tag names, e.g. "genre\\artist\\track - title".
+    return re.sub(r"\b(%s)\b" % "|".join(TEMPLATE_FIELDS), r"{\1}", format)
+
+def make_destination_template(output_config):
+    format = output_config["format"]
+    template = compile_template(format, default_sanitizer=sanitize, allowed_fields=TEMPLATE_FIELDS)
+
+    # Without a per-track placeholder every track maps to the same file and
+    # all but the first one would be skipped silently.
+    if not template.fields:
+        suggestion = make_legacy_format_suggestion(format)
+        if suggestion != format:
+            raise ValueError(
+                f"Output format '{format}' uses bare tag names, which are no longer supported. "
+                f"Migrate it to {{placeholder}} syntax, e.g. '{suggestion}'")
+        raise ValueError(f"Output format '{format}' contains no placeholders")
+    if TRACK_TAG_NAME not in template.fields and TITLE_TAG_NAME not in template.fields:
+        raise ValueError(
+            f"Output format '{format}' must contain {{{TRACK_TAG_NAME}}} or {{{TITLE_TAG_NAME}}} "
+            "to give every track its own file")
+
+    return template
+
+def make_destination_file_name(output_config, template, toc, track):
     out_path = output_config["path"]
-    formatted_file_path = output_config["format"] \
-        .replace(ARTIST_TAG_NAME, sanitize(toc[ARTIST_TAG_NAME])) \
-        .replace(ALBUM_TAG_NAME, sanitize(toc[ALBUM_TAG_NAME])) \
-        .replace(GENRE_TAG_NAME, sanitize(toc[GENRE_TAG_NAME])) \
-        .replace(YEAR_TAG_NAME, sanitize(toc[YEAR_TAG_NAME])) \
-        .replace(TRACK_TAG_NAME, sanitize(track[TRACK_TAG_NAME])) \
-        .replace(TITLE_TAG_NAME, sanitize(track[TITLE_TAG_NAME]))
+    formatted_file_path = template.render({
+        ARTIST_TAG_NAME: toc[ARTIST_TAG_NAME],
+        ALBUM_TAG_NAME: toc[ALBUM_TAG_NAME],
+        GENRE_TAG_NAME: toc[GENRE_TAG_NAME],
+        YEAR_TAG_NAME: toc[YEAR_TAG_NAME],
+        TRACK_TAG_NAME: track[TRACK_TAG_NAME],
+        TITLE_TAG_NAME: track[TITLE_TAG_NAME]
+    })
     return os.path.join(out_path, formatted_file_path + "." + output_config["type"])
 
 def make_destination_folder(destination_filename):
@@ -106,7 +135,7 @@ def write_mp3_tags(file, album_tags, file_tags, cover_art_filename):
 
     song.tag.save(version=eyed3.id3.ID3_V2_3)
 
-def read_dir(dir, input_type, output_config):
+def read_dir(dir, input_type, output_config, template):
     with codecs.open(os.path.join(dir, TOC_FILENAME), "r", encoding="UTF-8") as f:
         cover_art_filename = os.path.join(dir, "Cover.jpg")
         toc = json.load(f)
@@ -115,18 +144,18 @@ def read_dir(dir, input_type, output_config):
             source = os.path.join(dir, track[FILENAME_TAG_NAME][SHORT_FILENAME_TAG_NAME])
             assert os.path.exists(source), f"File not found {source}"
 
-            destination = make_destination_file_name(output_config, toc, track)
+            destination = make_destination_file_name(output_config, template, toc, track)
             make_destination_folder(destination)
 
             if not os.path.exists(destination):
                 convert_file(output_config, source, destination)
                 write_mp3_tags(destination, toc, track, cover_art_filename)
 
-def read_recursive(input_config, output_config):
+def read_recursive(input_config, output_config, template):
     root_path = input_config["path"]
     for subdir, _, _ in os.walk(root_path):
         if os.path.exists(os.path.join(subdir, TOC_FILENAME)):
-            read_dir(subdir, input_config["type"], output_config)
+            read_dir(subdir, input_config["type"], output_config, template)
 
 def read_config(config_path):
     input_config = None
@@ -164,10 +193,11 @@ def parse_args():
 args = parse_args()
 
 input_config, output_config = read_config(make_abs_config_path(args.config))
+template = make_destination_template(output_config)
 
 eyed3.log.setLevel("ERROR")
 
 if input_config["recurse"] is True:
-    read_recursive(input_config, output_config)
+    read_recursive(input_config, output_config, template)
 else:
-    read_dir(input_config["path"], input_config["type"], output_config)
\ No newline at end of file
+    read_dir(input_config["path"], input_config["type"], output_config, template)
\ No newline at end of file
@@ -18,6 +18,7 @@ import json
 import codecs
 import argparse
 from pathvalidate import sanitize_filename
+from naming_template import compile_template
 
 ARTIST_TAG_NAME = "artist"
 ALBUM_TAG_NAME = "album"
@@ -119,17 +120,16 @@ def remove_redundant_tags(file_tags):
     file_tags.pop(GENRE_TAG_NAME, None)
     file_tags.pop(YEAR_TAG_NAME, None)
     
-def read_tags(filename, config):
-    format_list = config["format"]
-    tag_list = filename.split(config["delim"])
-    assert len(tag_list) <= len(format_list), f"Number tags in file {filename} larger than expected according to format"
-    
-    file_tags = {}
-    for index, value in enumerate(tag_list):
-        tag_name = format_list[index]
-        file_tags[tag_name] = replace_specials(value)
+def make_template(config):
+    # Escape braces in the delimiter, it is literal text of the template.
+    delim = config["delim"].replace("{", "{{").replace("}", "}}")
+    return compile_template(delim.join("{%s}" % tag for tag in config["format"]))
+
+def read_tags(filename, template):
+    file_tags = template.parse(filename)
+    assert file_tags is not None, f"File {filename} does not match the format; it contains too many tags or a cut off delimiter"
 
-    return file_tags
+    return {tag_name: replace_specials(value) for tag_name, value in file_tags.items()}
 
 def write_toc_file(dir, record_metadata):
     with codecs.open(os.path.join(dir, TOC_FILENAME), "w", encoding="UTF-8") as json_file:
@@ -147,6 +147,7 @@ def read_dir(subdir, config):
         print(f"Folder {subdir} already contains ToC")
         return
     
+    template = make_template(config)
     with os.scandir(subdir) as iter:
         record_metadata = {
             ARTIST_TAG_NAME: "",
@@ -162,7 +163,7 @@ def read_dir(subdir, config):
                 file = entry.name
                 file_no_ext = file[:-1 * (1 + len(type))]
 
-                file_tags = read_tags(file_no_ext, config)
+                file_tags = read_tags(file_no_ext, template)
                 file_tags[FILENAME_TAG_NAME] = {
                     LONG_FILENAME_TAG_NAME: entry.name,
                     SHORT_FILENAME_TAG_NAME: simple_filename(file_tags, type)
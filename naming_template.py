@@ -0,0 +1,156 @@
+# Shared file naming templates used by create-toc.py, convert-music.py
+# and rearrange-music.py.
+#
+# A template is a string with `{placeholder}` fields, e.g.
+#
+#   {genre}/{artist}/{year} - {album}/{track} - {title}
+#
+# It is compiled once into a list of literal text and field names, so
+# rendering a path is a single `str.format` call instead of a chain of
+# `str.replace` calls that may also hit literal text or other values.
+# Placeholder names are case-insensitive and `{{` / `}}` produce literal
+# braces.
+#
+# Usage example:
+#   template = compile_template("{track} - {title}", sanitizers={"title": clean})
+#   template.render({"track": "01", "title": "The hunt"})
+#   template.parse("01 - The hunt")
+
+import re
+import string
+import functools
+
+SANITIZER_CACHE_SIZE = 4096
+
+def _identity(value):
+    return value
+
+def _memoize(sanitizer):
+    # Artist, album, genre and year repeat for every track of a disc, so
+    # cache the sanitized value instead of cleaning it again and again.
+    return functools.lru_cache(maxsize=SANITIZER_CACHE_SIZE)(sanitizer)
+
+def _tokenize(format):
+    literals = []
+    fields = []
+    try:
+        tokens = list(string.Formatter().parse(format))
+    except ValueError as e:
+        raise ValueError(f"Invalid naming template '{format}': {e}") from None
+
+    pending_literal = ""
+    for literal, field, spec, conversion in tokens:
+        pending_literal += literal
+        if field is None:
+            continue
+        if not field.isidentifier() or spec or conversion:
+            raise ValueError(f"Invalid placeholder '{{{field}}}' in naming template '{format}'")
+        literals.append(pending_literal)
+        fields.append(field.lower())
+        pending_literal = ""
+
+    # There is always one more literal than fields, the trailing one may be empty.
+    literals.append(pending_literal)
+    return literals, fields
+
+class NamingTemplate:
+    def __init__(self, format, sanitizers=None, default_sanitizer=None, allowed_fields=None, memoize=True):
+        self.format = format
+        self.literals, self.fields = _tokenize(format)
+
+        if allowed_fields is not None:
+            allowed_fields = {field.lower() for field in allowed_fields}
+            unknown = [field for field in self.fields if field not in allowed_fields]
+            if unknown:
+                raise ValueError(f"Unsupported placeholder(s) {', '.join(unknown)} in naming template '{format}'")
+
+        # Sanitizers with side effects, e.g. printing a warning, must be called
+        # for every value; those templates are compiled with memoize=False.
+        wrap = _memoize if memoize else _identity
+        sanitizers = sanitizers or {}
+        default_sanitizer = wrap(default_sanitizer) if default_sanitizer else _identity
+        wrapped = {name.lower(): wrap(sanitizer) for name, sanitizer in sanitizers.items()}
+        self._plan = tuple(
+            (field, wrapped.get(field, default_sanitizer)) for field in self.fields)
+
+        # Escape braces of literal text again so the whole template can be
+        # rendered with positional `str.format` fields.
+        self._format_string = "".join(
+            literal.replace("{", "{{").replace("}", "}}") + ("{%d}" % index if index < len(self.fields) else "")
+            for index, literal in enumerate(self.literals))
+        self._regex = None
+
+        # Templates like `{artist}#{album}#{title}` only separate fields by
+        # one delimiter, these can be parsed with a plain `str.split`.
+        inner_literals = set(self.literals[1:-1])
+        self._delim = None
+        if not self.literals[0] and not self.literals[-1] and len(inner_literals) == 1:
+            self._delim = inner_literals.pop()
+
+    # Fill in all placeholders from `values`, a dict keyed by lower case
+    # field name. Missing values are rendered as empty string.
+    def render(self, values):
+        return self._format_string.format(
+            *[sanitize(values.get(field, "")) for field, sanitize in self._plan])
+
+    # Extract the placeholder values from `text`. Values must not contain any
+    # of the template's literal text. Trailing fields may be missing, they are
+    # simply not part of the result. Returns None if `text` does not match.
+    def parse(self, text):
+        if self._delim:
+            values = text.split(self._delim)
+            if len(values) > len(self.fields):
+                return None
+        else:
+            if self._regex is None:
+                self._regex = self._compile_regex()
+
+            match = self._regex.match(text)
+            if not match:
+                return None
+            values = [value for value in match.groups() if value is not None]
+
+        if len(values) < len(self.fields) and self._ends_in_literal(values[-1], len(values)):
+            return None
+        return dict(zip(self.fields, values))
+
+    def _ends_in_literal(self, value, index):
+        # When trailing fields are missing, the last value must not end with
+        # the beginning of the literal that follows it, e.g. `a]` for
+        # `[{artist}] {album}`; that text is a cut off separator.
+        literal = self.literals[index]
+        return any(value.endswith(literal[:length]) for length in range(1, len(literal)))
+
+    def _compile_regex(self):
+        if not all(self.literals[1:-1]):
+            raise ValueError(f"Naming template '{self.format}' has adjacent placeholders and cannot be parsed")
+
+        separators = sorted({literal for literal in self.literals if literal}, key=len, reverse=True)
+        if separators:
+            value_pattern = "((?:(?!%s).)*)" % "|".join(re.escape(sep) for sep in separators)
+        else:
+            value_pattern = "(.*)"
+
+        # Nest the fields so that trailing ones are optional, the trailing
+        # literal is only expected after the last field:
+        #   lit0 field0 (?: lit1 field1 (?: lit2 field2 lit3 )? )?
+        pattern = re.escape(self.literals[-1])
+        for index in reversed(range(1, len(self.fields))):
+            pattern = "(?:%s%s%s)?" % (re.escape(self.literals[index]), value_pattern, pattern)
+        if self.fields:
+            pattern = re.escape(self.literals[0]) + value_pattern + pattern
+
+        return re.compile(pattern + "\\Z", re.DOTALL)
+
+@functools.lru_cache(maxsize=None)
+def _compile_cached(format, sanitizers, default_sanitizer, allowed_fields, memoize):
+    return NamingTemplate(format, dict(sanitizers), default_sanitizer, allowed_fields, memoize)
+
+# Compile `format` once; identical calls return the same template.
+def compile_template(format, sanitizers=None, default_sanitizer=None, allowed_fields=None, memoize=True):
+    return _compile_cached(
+        format,
+        tuple(sorted((sanitizers or {}).items())),
+        default_sanitizer,
+        frozenset(allowed_fields) if allowed_fields is not None else None,
+        memoize)
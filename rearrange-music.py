@@ -3,7 +3,9 @@ import taglib
 import argparse
 import shutil
 import string
+import functools
 import unicodedata
+from naming_template import compile_template
 
 ARTIST_TAG = "ARTIST"
 ALBUM_TAG = "ALBUM"
@@ -17,12 +19,17 @@ VALID_FNAME_CHARS = "-_() %s%s" % (string.ascii_letters, string.digits)
 CHAR_LIMIT = 255
 
 # Thx to https://gist.github.com/wassname/1393c4a57cfcbf03641dbc31886123b8 for this method.
-def clean_filename(filename, whitelist=VALID_FNAME_CHARS):
+# Artist, album and so on repeat for every track, so cache the cleaned value.
+@functools.lru_cache(maxsize=4096)
+def whitelist_filename(filename, whitelist=VALID_FNAME_CHARS):
     # keep only valid ascii chars
     cleaned_filename = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode()
     
     # keep only whitelisted chars
-    cleaned_filename = ''.join(c for c in cleaned_filename if c in whitelist)
+    return ''.join(c for c in cleaned_filename if c in whitelist)
+
+def clean_filename(filename, whitelist=VALID_FNAME_CHARS):
+    cleaned_filename = whitelist_filename(filename, whitelist)
     if len(cleaned_filename)>CHAR_LIMIT:
         print("Warning, filename truncated because it was over {}. Filenames may no longer be unique".format(CHAR_LIMIT))
     return cleaned_filename[:CHAR_LIMIT] 
@@ -30,8 +37,8 @@ def clean_filename(filename, whitelist=VALID_FNAME_CHARS):
 def is_hidden(name):
     return name[0] == "."
 
-def make_placeholder(tag):
-    return "{%s}" % tag
+def make_field_name(tag):
+    return tag.lower()
 
 def concat_with_sep(path, other):
     pathcopy = path
@@ -57,7 +64,7 @@ def read_tags(file):
 
             # Flatten the lists of values that are contained per tag into a single value.
             # Easier to use and all I need.
-            tags[make_placeholder(suptag)] = value
+            tags[make_field_name(suptag)] = value
     return tags
 
 def move_file(srcfile, destpath, fname):
@@ -72,15 +79,19 @@ def move_file(srcfile, destpath, fname):
         print("File already exists '%s'" % destfile)
         os.remove(srcfile)
 
-def dest_fname(src, dest, file, format):
-    newpath = format.upper()
+def make_template(format):
+    return compile_template(
+        format,
+        default_sanitizer=clean_filename,
+        allowed_fields=[make_field_name(tag) for tag in SUPPORTED_TAGS],
+        # Keep the truncation warning for every file, clean_filename caches itself.
+        memoize=False)
+
+def dest_fname(src, dest, file, template):
     srcfile = concat_with_sep(src, file)
 
-    tags = read_tags(srcfile)
     # Replace all placeholders with values.
-    for tag in tags:
-        if tag in newpath:
-            newpath = newpath.replace(tag, clean_filename(tags[tag]))
+    newpath = template.render(read_tags(srcfile))
     
     # Extract the file name so we have it separately. We also need to attach the extension.
     _, ext = os.path.splitext(srcfile)
@@ -96,11 +107,11 @@ def dest_fname(src, dest, file, format):
     
     return (concat_with_sep(dest, newpath), destfname)
 
-def scan_src_and_move_files(src, dest, format):
+def scan_src_and_move_files(src, dest, template):
     for subdir, _, files in os.walk(src):
         for file in files:
             if not is_hidden(file):
-                path, fname = dest_fname(subdir, dest, file, format)
+                path, fname = dest_fname(subdir, dest, file, template)
                 move_file(concat_with_sep(subdir, file), path, fname)
 
 parser = argparse.ArgumentParser()
@@ -116,5 +127,11 @@ args = parser.parse_args()
 if not os.path.isdir(args.src):
     print("ERROR: Source must be a directory")
     exit(1)
-else:
-    scan_src_and_move_files(args.src, args.dest, args.format)
+
+try:
+    template = make_template(args.format)
+except ValueError as e:
+    print("ERROR: %s" % e)
+    exit(1)
+
+scan_src_and_move_files(args.src, args.dest, template)